@@ -3,6 +3,8 @@ Agent cache module for storing VacationChatAgent instances with TTL.
 """
 import time
 import asyncio
+import contextlib
+from collections import OrderedDict
 from typing import Dict, Tuple, Optional
 import logging
 
@@ -10,18 +12,69 @@ from agents.vacation_agent import VacationChatAgent
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of expired entries removed per lock acquisition during cleanup
+CLEANUP_BATCH = 256
+
+class _Entry:
+    """Cached agent and the monotonic time at which it expires."""
+    __slots__ = ("agent", "expiry")
+    
+    def __init__(self, agent: VacationChatAgent, expiry: float):
+        self.agent = agent
+        self.expiry = expiry
+
 class AgentCache:
     """Cache for VacationChatAgent instances with TTL."""
     
-    def __init__(self, ttl_seconds: int = 3600):
+    def __init__(self, ttl_seconds: int = 3600, max_size: int = 10000):
         """Initialize the agent cache.
         
         Args:
             ttl_seconds: Time to live in seconds for each agent instance (default: 1 hour)
+            max_size: Maximum number of cached agents; the least recently used
+                agents are evicted beyond this (default: 10000)
         """
-        self._cache: Dict[str, Tuple[VacationChatAgent, float]] = {}
+        # Entries are kept in last-touched order: since the TTL is the same for
+        # every session, the head of the dict is always the next one to expire.
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Sessions whose agent is currently being built, so concurrent first
+        # requests wait for that agent instead of building their own
+        self._pending: Dict[str, asyncio.Event] = {}
         self._ttl_seconds = ttl_seconds
+        self._max_size = max_size
         self._lock = asyncio.Lock()
+        # Set when an entry lands in an empty cache, waking the cleanup loop
+        self._wake = asyncio.Event()
+        # Strong references to in-progress agent closes so they aren't GC'd
+        self._closing = set()
+        
+    def _close_agent(self, agent: VacationChatAgent) -> None:
+        """Close an agent dropped from the cache without blocking the caller."""
+        task = asyncio.create_task(agent.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+        
+    def _insert(self, session_id: str, agent: VacationChatAgent) -> None:
+        """Store an agent as the most recently touched entry. Caller holds the lock."""
+        was_empty = not self._entries
+        expiry = time.monotonic() + self._ttl_seconds
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self._entries[session_id] = _Entry(agent, expiry)
+        else:
+            if entry.agent is not agent:
+                self._close_agent(entry.agent)
+                entry.agent = agent
+            entry.expiry = expiry
+            self._entries.move_to_end(session_id)
+        if was_empty:
+            self._wake.set()
+        
+        # Evict least recently used agents beyond the size cap
+        while len(self._entries) > self._max_size:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            self._close_agent(evicted.agent)
+            logger.info("Evicted agent for session %s (cache full)", evicted_id)
         
     async def get(self, session_id: str) -> VacationChatAgent:
         """Get an agent instance from the cache or create a new one if not exists.
@@ -32,26 +85,62 @@ class AgentCache:
         Returns:
             The agent instance (either existing or newly created)
         """
-        async with self._lock:
-            # Check if we have a cached agent
-            if session_id in self._cache:
-                agent, timestamp = self._cache[session_id]
-                current_time = time.time()
+        agent, _ = await self.get_or_create(session_id)
+        return agent
+    
+    async def get_or_create(self, session_id: str) -> Tuple[VacationChatAgent, bool]:
+        """Get an agent instance from the cache or create a new one if not exists.
+        
+        The cache lock is not held while a new agent is constructed.
+        
+        Args:
+            session_id: The session ID to look up
+            
+        Returns:
+            A tuple of the agent instance and whether it was newly created
+        """
+        while True:
+            async with self._lock:
+                # Check if we have a cached agent
+                entry = self._entries.get(session_id)
+                if entry is not None:
+                    current_time = time.monotonic()
+                    
+                    # Check if the agent has expired
+                    if current_time > entry.expiry:
+                        logger.info("Agent for session %s has expired", session_id)
+                        del self._entries[session_id]
+                        self._close_agent(entry.agent)
+                    else:
+                        # Extend the TTL
+                        entry.expiry = current_time + self._ttl_seconds
+                        self._entries.move_to_end(session_id)
+                        return entry.agent, False
                 
-                # Check if the agent has expired
-                if current_time - timestamp > self._ttl_seconds:
-                    logger.info(f"Agent for session {session_id} has expired")
-                    del self._cache[session_id]
-                else:
-                    # Update the timestamp to extend the TTL
-                    self._cache[session_id] = (agent, current_time)
-                    return agent
+                # Reserve the session unless another request is already building it
+                ready = self._pending.get(session_id)
+                if ready is None:
+                    ready = asyncio.Event()
+                    self._pending[session_id] = ready
+                    break
             
-            # Create new agent if not found or expired
-            logger.info(f"Creating new agent for session {session_id}")
-            agent = VacationChatAgent()
-            self._cache[session_id] = (agent, time.time())
-            return agent
+            # Wait for the in-flight agent, then look it up again; the request
+            # that built it is the one that sees the session as new
+            await ready.wait()
+        
+        # Create new agent if not found or expired, off the event loop thread:
+        # the first construction on each event loop builds the shared kernel
+        # and Azure OpenAI service, which blocks
+        logger.info("Creating new agent for session %s", session_id)
+        try:
+            agent = await asyncio.to_thread(VacationChatAgent, asyncio.get_running_loop())
+            async with self._lock:
+                self._insert(session_id, agent)
+            return agent, True
+        finally:
+            # Release waiters even if construction failed so one of them can retry
+            del self._pending[session_id]
+            ready.set()
     
     async def put(self, session_id: str, agent: VacationChatAgent) -> None:
         """Store an agent instance in the cache.
@@ -61,48 +150,57 @@ class AgentCache:
             agent: The agent instance to store
         """
         async with self._lock:
-            self._cache[session_id] = (agent, time.time())
-            logger.info(f"Stored agent for session {session_id}")
+            self._insert(session_id, agent)
+            logger.info("Stored agent for session %s", session_id)
     
-    async def exists(self, session_id: str) -> bool:
-        """Check if a session exists in the cache.
+    async def cleanup_expired(self) -> None:
+        """Remove expired agent instances from the cache.
         
-        Args:
-            session_id: The session ID to check
-            
-        Returns:
-            True if the session exists and is not expired, False otherwise
+        Entries are ordered oldest first, so the scan stops at the first
+        entry that is still fresh. At most CLEANUP_BATCH entries are removed
+        per lock acquisition, yielding to other requests between batches.
         """
-        async with self._lock:
-            if session_id in self._cache:
-                _, timestamp = self._cache[session_id]
-                current_time = time.time()
-                # Check if the agent has expired
-                if current_time - timestamp > self._ttl_seconds:
-                    return False
-                return True
-            return False
-        
-    async def cleanup_expired(self) -> None:
-        """Remove expired agent instances from the cache."""
-        current_time = time.time()
-        expired_keys = []
+        current_time = time.monotonic()
+        expired_count = 0
         
-        async with self._lock:
-            for session_id, (_, timestamp) in self._cache.items():
-                if current_time - timestamp > self._ttl_seconds:
-                    expired_keys.append(session_id)
-            
-            for session_id in expired_keys:
-                del self._cache[session_id]
+        while True:
+            async with self._lock:
+                batch_count = 0
+                while self._entries and batch_count < CLEANUP_BATCH:
+                    entry = next(iter(self._entries.values()))
+                    if current_time <= entry.expiry:
+                        break
+                    self._entries.popitem(last=False)
+                    self._close_agent(entry.agent)
+                    batch_count += 1
+            expired_count += batch_count
+            if batch_count < CLEANUP_BATCH:
+                break
+            await asyncio.sleep(0)
                 
-            if expired_keys:
-                logger.info(f"Cleaned up {len(expired_keys)} expired agent instances")
+        if expired_count:
+            logger.info("Cleaned up %d expired agent instances", expired_count)
+    
+    async def wait_for_expiry(self) -> None:
+        """Sleep until the oldest entry is due to expire.
+        
+        With an empty cache this sleeps until an entry is added, so an idle
+        cache never wakes the cleanup loop.
+        """
+        self._wake.clear()
+        timeout = None
+        if self._entries:
+            entry = next(iter(self._entries.values()))
+            timeout = max(0.0, entry.expiry - time.monotonic())
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
     
     @property
     def size(self) -> int:
         """Get the current number of agent instances in the cache."""
-        return len(self._cache)
+        return len(self._entries)
 
 class AgentCacheManager:
     """Manager for agent cache with background cleanup task."""
@@ -119,9 +217,9 @@ class AgentCacheManager:
         """Store an agent instance in the cache."""
         await self.cache.put(session_id, agent)
     
-    async def exists(self, session_id: str) -> bool:
-        """Check if a session exists in the cache."""
-        return await self.cache.exists(session_id)
+    async def get_or_create(self, session_id: str) -> Tuple[VacationChatAgent, bool]:
+        """Get an agent instance from the cache, reporting whether it was newly created."""
+        return await self.cache.get_or_create(session_id)
         
     async def cleanup_expired(self) -> None:
         """Remove expired agent instances from the cache."""
@@ -132,29 +230,18 @@ class AgentCacheManager:
         """Get the current number of agent instances in the cache."""
         return self.cache.size
         
-    def start_cleanup_task(self, app=None):
+    async def _cleanup_loop(self) -> None:
+        """Remove expired agents as their TTLs run out."""
+        while True:
+            await self.cache.wait_for_expiry()
+            await self.cleanup_expired()
+            logger.info("Cache cleanup complete. Current size: %d", self.size)
+            
+    def start_cleanup_task(self):
         """Start background task for cache cleanup."""
-        async def cleanup_loop():
-            while True:
-                await asyncio.sleep(300)  # Run every 5 minutes
-                await self.cleanup_expired()
-                logger.info(f"Cache cleanup complete. Current size: {self.size}")
-                
-        if app:
-            # Register with FastAPI app lifecycle
-            @app.on_event("startup")
-            async def start_cache_cleanup():
-                self._cleanup_task = asyncio.create_task(cleanup_loop())
-                logger.info("Started agent cache cleanup task")
-                
-            @app.on_event("shutdown")
-            async def stop_cache_cleanup():
-                if self._cleanup_task:
-                    self._cleanup_task.cancel()
-                    logger.info("Stopped agent cache cleanup task")
-        else:
-            # Start immediately without FastAPI
-            self._cleanup_task = asyncio.create_task(cleanup_loop())
+        if self._cleanup_task is None:
+            # Keep a strong reference so the task isn't garbage collected
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
             logger.info("Started agent cache cleanup task")
             
     def stop_cleanup_task(self):
@@ -163,6 +250,21 @@ class AgentCacheManager:
             self._cleanup_task.cancel()
             self._cleanup_task = None
             logger.info("Stopped agent cache cleanup task")
+    
+    @contextlib.asynccontextmanager
+    async def run_cleanup_task(self):
+        """Run the cleanup task for the duration of the context, e.g. an app lifespan.
+        
+        On exit the task is cancelled and awaited so it has fully stopped.
+        """
+        self.start_cleanup_task()
+        task = self._cleanup_task
+        try:
+            yield
+        finally:
+            self.stop_cleanup_task()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
 
 # Singleton instance
 agent_cache = AgentCacheManager()
@@ -9,22 +9,31 @@ from fastapi.staticfiles import StaticFiles
 import uvicorn
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from models.request_models import ChatRequest
 from models.response_models import ChatResponse
 
 from agents.vacation_agent import VacationChatAgent
 from agent_cache.agent_cache import agent_cache
+from datasource.mulesoft_service import mulesoft_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Vacation Chatbot")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the agent cache cleanup task for the lifetime of the app."""
+    async with agent_cache.run_cleanup_task():
+        try:
+            yield
+        finally:
+            # Close pooled MuleSoft connections on shutdown
+            await mulesoft_service.aclose()
 
-# Register cache cleanup task with FastAPI lifecycle
-agent_cache.start_cleanup_task(app)
+app = FastAPI(title="Vacation Chatbot", lifespan=lifespan)
 
 # Mount static directory (for JS / CSS if needed)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -39,14 +48,12 @@ async def index():
 async def chat_endpoint(chat_req: ChatRequest):
     """Handle chat message using session-specific agent instances."""
     # Get or create agent for this session
-    is_new_session = not await agent_cache.exists(chat_req.request_session)
-    agent = await agent_cache.get(chat_req.request_session)
+    agent, is_new_session = await agent_cache.get_or_create(chat_req.request_session)
     
     # For new sessions, always get initial greeting that includes package destination
     if is_new_session:
         # Log that we're handling a new session
         logger.info(f"New session detected: {chat_req.request_session}")
-        print("New session detected: ", chat_req.request_session)
         # Always send initial greeting for new sessions
         logger.info("New session, sending initial greeting")
         response_text = await agent.get_initial_greeting()
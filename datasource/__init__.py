@@ -15,4 +15,4 @@ Configuration is managed through the config module, which supports environment
 variables for API settings.
 """
 
-from .mulesoft_service import (MuleSoftService)
\ No newline at end of file
+from .mulesoft_service import (MuleSoftService, mulesoft_service)
\ No newline at end of file
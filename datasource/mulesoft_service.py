@@ -3,85 +3,193 @@ Unified MuleSoft Service Integration
 
 This module provides a single service class for all MuleSoft API operations
 including packages, availability, and accommodation services.
+
+Each operation is a coroutine (``aget_*``) that runs on an
+``httpx.AsyncClient`` shared per event loop.
+Successful responses are cached in memory for a short TTL, keyed on the
+query parameters, so repeated lookups within a conversation skip the API.
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
-import requests
+import threading
+from typing import Dict, Any, Callable, Hashable, Optional, List, Tuple
+import httpx
+import orjson
+import simdjson
+from cachetools import TTLCache
+from pydantic import TypeAdapter
 from models.package_models import PackageResponseModel
 from models.availability_models import AvailabilityResponse
 from models.accommodation_models import Accommodation
+from system.config import MULESOFT_CACHE_TTL, MULESOFT_CACHE_MAXSIZE
 
 logger = logging.getLogger(__name__)
 
+# Validators are built once at import instead of being looked up per call
+_AVAILABILITY_ADAPTER = TypeAdapter(AvailabilityResponse)
+_ACCOMMODATION_LIST_ADAPTER = TypeAdapter(List[Accommodation])
+
+PACKAGES_PATH = "/consumerweb/vacationPackages/orders"
+AVAILABILITIES_PATH = "/consumerweb/vacationPackages/orders/availabilities"
+ACCOMMODATIONS_PATH = "/consumerweb/vacationPackages/orders/accommodations"
+
 
 class MuleSoftService:
     """Unified service class for all MuleSoft API integrations."""
-    
-    def __init__(self):
-        """Initialize the MuleSoft service with common configuration."""
+
+    def __init__(self,
+                 trusted: bool = True,
+                 cache_ttl: int = MULESOFT_CACHE_TTL,
+                 cache_maxsize: int = MULESOFT_CACHE_MAXSIZE):
+        """Initialize the MuleSoft service with common configuration.
+
+        Args:
+            trusted: Return successful responses as decoded JSON without Pydantic
+                validation (default: True). MuleSoft is an internal API whose
+                responses follow the models' schema; a response that doesn't
+                will surface as a KeyError/TypeError in the tools rather than a
+                validation warning here. The tools read this flag to decide
+                whether to validate the models they build from the responses.
+                Pass False to validate every response.
+            cache_ttl: Seconds a successful response is served from memory
+                (default: MULESOFT_CACHE_TTL, 15 minutes)
+            cache_maxsize: Maximum number of cached responses
+                (default: MULESOFT_CACHE_MAXSIZE)
+        """
         self.base_url = "https://apis.orangelake.com"
         self.common_headers = {
             "X-Env": "qa",
             "Accept": "application/json",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "User-Agent": "PostmanRuntime/7.44.1"
+            # br is decoded natively by httpx when brotli is installed
+            "Accept-Encoding": "gzip, deflate, br"
         }
         self.timeout = 30
+        self.trusted = trusted
+
+        # Async clients for the aget_* methods keyed by id() of the event loop
+        # they run on: a client's connection pool holds asyncio primitives
+        # bound to the loop that first used it
+        self._clients: Dict[int, httpx.AsyncClient] = {}
+
+        # Decoded responses keyed on (path, params); the lock makes the cache
+        # safe to share between event loops running in different threads
+        self._cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
+        self._cache_lock = threading.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the running event loop's async HTTP client, creating it on first use."""
+        loop_id = id(asyncio.get_running_loop())
+        client = self._clients.get(loop_id)
+        if client is None or client.is_closed:
+            client = self._clients[loop_id] = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=True,
+                headers=self.common_headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+            )
+        return client
+
+    @staticmethod
+    def _cache_key(path: str, params: Dict[str, Any], *extra: Hashable) -> tuple:
+        """Build the response cache key for a request."""
+        return (path, tuple(sorted(params.items())), *extra)
+
+    def _cache_get(self, key: tuple) -> Any:
+        """Return the cached response for a key, or None if absent or expired."""
+        with self._cache_lock:
+            return self._cache.get(key)
+
+    def _cache_put(self, key: tuple, value: Any) -> Any:
+        """Cache a decoded response and return it."""
+        with self._cache_lock:
+            self._cache[key] = value
+        return value
+
+    async def _aget(self,
+                    path: str,
+                    params: Dict[str, Any],
+                    parse: Callable[[httpx.Response], Any],
+                    error_message: str,
+                    headers: Optional[Dict[str, str]] = None,
+                    cache_extra: Tuple[Hashable, ...] = ()) -> Any:
+        """GET a MuleSoft path on the loop's client, serving and caching the decoded response."""
+        key = self._cache_key(path, params, *cache_extra)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            logger.info("GET %s with params %s", path, params)
+
+            response = await self._get_client().get(path, headers=headers, params=params)
+            response.raise_for_status()
+
+            return self._cache_put(key, parse(response))
+
+        except Exception as e:
+            logger.error(f"{error_message}: {e}")
+            raise
+
+    async def aclose(self) -> None:
+        """Close the running event loop's async HTTP client.
+
+        Clients used on other event loops are bound to those loops, so each
+        loop should call aclose() itself before it shuts down.
+        """
+        client = self._clients.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
 
     # Package-related methods
-    def get_packages_mulesoft_api(self, package_id: str) -> Dict[str, Any]:
+    async def aget_packages(self, package_id: str) -> Dict[str, Any]:
         """
         Get package details using the provided package ID.
-        
+
         Args:
             package_id: The ID of the package to retrieve
-            
+
         Returns:
             Dictionary containing package details (parsed with Pydantic if possible)
         """
+        return await self._aget(PACKAGES_PATH, self._package_params(package_id), self._parse_package,
+                                "Error fetching package details", headers={"Accept": "*/*"})
+
+    def _package_params(self, package_id: str) -> Dict[str, Any]:
+        """Build the query parameters for a package request."""
+        # Build parameters dict, excluding None values
+        params = {}
+        params["packageId"] = package_id
+        return params
+
+    def _parse_package(self, response: Any) -> Dict[str, Any]:
+        """Decode a package response, validating it unless the service is trusted."""
+        package_data = orjson.loads(response.content)
+        if self.trusted:
+            return package_data
+        # Validate with the Pydantic model; the decoded data is returned either
+        # way, so there is no model_dump() round trip
         try:
-            url = f"{self.base_url}/consumerweb/vacationPackages/orders"
-
-            # Build parameters dict, excluding None values
-            params = {}
-            params["packageId"] = package_id
-                
-            headers = {**self.common_headers, "Accept": "*/*"}
-            
-            # Make the GET request to the MuleSoft API
-            response = requests.get(url, headers=headers, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # Parse the JSON response
-            package_data = response.json()
-            
-            # Validate and parse with Pydantic model
-            try:
-                parsed = PackageResponseModel.model_validate(package_data)
-                return parsed.model_dump()
-            except Exception as e:
-                logger.warning(f"Package Pydantic validation failed, returning raw data: {e}")
-                return package_data
-                
+            # The model's own validator, so its deferred build only happens here
+            PackageResponseModel.model_validate(package_data)
         except Exception as e:
-            logger.error(f"Error fetching package details: {e}")
-            raise
+            logger.warning(f"Package Pydantic validation failed, returning raw data: {e}")
+        return package_data
 
     # Availability-related methods
-    def get_availabilities_mulesoft_api(self, 
-                                      package_id: str,
-                                      destination: str,
-                                      length_of_stay: int,
-                                      campaign_intitiative_id: str,
-                                      accommodation_type: str,
-                                      number_of_guests: int, 
-                                      search_start_date: str, 
-                                      search_end_date: str) -> Dict[str, Any]:
+    async def aget_availabilities(self,
+                                  package_id: str,
+                                  destination: str,
+                                  length_of_stay: int,
+                                  campaign_intitiative_id: str,
+                                  accommodation_type: str,
+                                  number_of_guests: int,
+                                  search_start_date: str,
+                                  search_end_date: str) -> Dict[str, Any]:
         """
         Get availability data using the provided parameters.
-        
+
         Args:
             package_id: The ID of the package to retrieve availability for
             destination: The destination for the availability search
@@ -91,58 +199,62 @@ class MuleSoftService:
             number_of_guests: Number of guests for the stay
             search_start_date: Start date for availability search in YYYY-MM-DD format
             search_end_date: End date for availability search in YYYY-MM-DD format
-            
+
         Returns:
             Dictionary containing availability details (parsed with Pydantic if possible)
         """
+        params = self._availability_params(package_id, destination, length_of_stay, campaign_intitiative_id,
+                                           accommodation_type, number_of_guests, search_start_date, search_end_date)
+        return await self._aget(AVAILABILITIES_PATH, params, self._parse_availability,
+                                "Error fetching availabilities")
+
+    def _availability_params(self,
+                             package_id: str,
+                             destination: str,
+                             length_of_stay: int,
+                             campaign_intitiative_id: str,
+                             accommodation_type: str,
+                             number_of_guests: int,
+                             search_start_date: str,
+                             search_end_date: str) -> Dict[str, Any]:
+        """Build the query parameters for an availability request."""
+        # All parameters are required - set them directly
+        return {
+            "packageId": package_id,
+            "destination": destination,
+            "lengthOfStay": length_of_stay,
+            "campaignIntitiativeId": campaign_intitiative_id,
+            "accommodationType": accommodation_type,
+            "numberOfGuests": number_of_guests,
+            "searchStartDate": search_start_date,
+            "searchEndDate": search_end_date
+        }
+
+    def _parse_availability(self, response: Any) -> Dict[str, Any]:
+        """Decode an availability response, validating it unless the service is trusted."""
+        availability_data = orjson.loads(response.content)
+        if self.trusted:
+            return availability_data
+        # Validate with the Pydantic model; the decoded data is returned either way
         try:
-            url = f"{self.base_url}/consumerweb/vacationPackages/orders/availabilities"
-            
-            # All parameters are required - set them directly
-            params = {
-                "packageId": package_id,
-                "destination": destination,
-                "lengthOfStay": length_of_stay,
-                "campaignIntitiativeId": campaign_intitiative_id,
-                "accommodationType": accommodation_type,
-                "numberOfGuests": number_of_guests,
-                "searchStartDate": search_start_date,
-                "searchEndDate": search_end_date
-            }
-            
-            logger.info(f"GET Availabilities: {url} with params {params}")
-            
-            # Make the GET request to the MuleSoft API
-            response = requests.get(url, headers=self.common_headers, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            
-            # Parse the JSON response
-            availability_data = response.json()
-    
-            # Validate and parse with Pydantic model if possible
-            try:
-                parsed = AvailabilityResponse.model_validate(availability_data)
-                logger.info(f"Successfully parsed availability data with Pydantic model")
-                return parsed.model_dump()
-            except Exception as e:
-                logger.warning(f"Availability Pydantic validation failed, returning raw data: {e}")
-                return availability_data
-                
+            _AVAILABILITY_ADAPTER.validate_python(availability_data)
+            logger.info("Successfully validated availability data with Pydantic model")
         except Exception as e:
-            logger.error(f"Error fetching availabilities: {e}")
-            raise
+            logger.warning(f"Availability Pydantic validation failed, returning raw data: {e}")
+        return availability_data
 
     # Accommodation-related methods
-    def get_accommodations_mulesoft_api(self, 
-                                      campaign_initiative_id: str,
-                                      accommodation_type: str,
-                                      length_of_stay: int,
-                                      number_of_guests: int,
-                                      destination: str,
-                                      checkin_date: str) -> List[Dict[str, Any]]:
+    async def aget_accommodations(self,
+                                  campaign_initiative_id: str,
+                                  accommodation_type: str,
+                                  length_of_stay: int,
+                                  number_of_guests: int,
+                                  destination: str,
+                                  checkin_date: str,
+                                  first_night: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get accommodation data using the provided parameters.
-    
+
         Args:
             campaign_initiative_id: Campaign initiative ID
             accommodation_type: Type of accommodation requested
@@ -150,42 +262,61 @@ class MuleSoftService:
             number_of_guests: Number of guests for the stay
             destination: The destination for the accommodation search
             checkin_date: Check-in date in YYYY-MM-DD format
-    
+            first_night: If given, only accommodations whose firstNight matches
+                are decoded and returned
+
         Returns:
             List of accommodation dictionaries (parsed with Pydantic if possible)
         """
+        params = self._accommodation_params(campaign_initiative_id, accommodation_type, length_of_stay,
+                                            number_of_guests, destination, checkin_date)
+        # The firstNight filter changes the decoded result, so it is part of the key
+        return await self._aget(ACCOMMODATIONS_PATH, params,
+                                lambda response: self._parse_accommodations(response, first_night),
+                                "Failed to fetch accommodations", cache_extra=(first_night,))
+
+    def _accommodation_params(self,
+                              campaign_initiative_id: str,
+                              accommodation_type: str,
+                              length_of_stay: int,
+                              number_of_guests: int,
+                              destination: str,
+                              checkin_date: str) -> Dict[str, Any]:
+        """Build the query parameters for an accommodation request."""
+        # All parameters are required - set them directly
+        return {
+            "campaignInitiativeId": campaign_initiative_id,
+            "accommodationType": accommodation_type,
+            "lengthOfStay": length_of_stay,
+            "numberOfGuests": number_of_guests,
+            "destination": destination,
+            "checkinDate": checkin_date
+        }
+
+    def _parse_accommodations(self, response: Any, first_night: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Decode an accommodation response, validating it unless the service is trusted."""
+        if first_night is None:
+            accommodation_data = orjson.loads(response.content)
+        else:
+            # simdjson builds Python objects lazily, so rows for other dates
+            # (and their roomTypes) are skipped without being materialized
+            document = simdjson.Parser().parse(response.content)
+            accommodation_data = [
+                accommodation.as_dict()
+                for accommodation in document
+                if accommodation.get("firstNight") == first_night
+            ]
+        if self.trusted:
+            return accommodation_data
+        # The response is a list, so validate it with the list adapter; the
+        # decoded data is returned either way
         try:
-            url = f"{self.base_url}/consumerweb/vacationPackages/orders/accommodations"
-            
-            # All parameters are required - set them directly
-            params = {
-                "campaignInitiativeId": campaign_initiative_id,
-                "accommodationType": accommodation_type,
-                "lengthOfStay": length_of_stay,
-                "numberOfGuests": number_of_guests,
-                "destination": destination,
-                "checkinDate": checkin_date
-            }
-            
-            logger.info(f"GET Accommodations: {url} with params {params}")
-    
-            # Make the GET request to the MuleSoft API
-            response = requests.get(url, headers=self.common_headers, params=params, timeout=self.timeout)
-            response.raise_for_status()
-    
-            # Parse the JSON response
-            accommodation_data = response.json()
-    
-            # Try to parse each accommodation entry with the Pydantic model for validation and structure
-            try:
-                parsed = Accommodation.model_validate(accommodation_data)
-                logger.info(f"Parsed {len(parsed)} accommodations with Pydantic model")
-                return parsed.model_dump() 
-            except Exception as e:
-                logger.warning(f"Accommodation Pydantic validation failed, returning raw data: {e}")
-                return accommodation_data
-    
+            parsed = _ACCOMMODATION_LIST_ADAPTER.validate_python(accommodation_data)
+            logger.info("Validated %d accommodations with Pydantic model", len(parsed))
         except Exception as e:
-            # Log any errors that occur during the API call or processing
-            logger.error(f"Failed to fetch accommodations: {str(e)}")
-            raise
\ No newline at end of file
+            logger.warning(f"Accommodation Pydantic validation failed, returning raw data: {e}")
+        return accommodation_data
+
+
+# Shared service instance so callers reuse one connection pool
+mulesoft_service = MuleSoftService()
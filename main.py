@@ -2,11 +2,28 @@ import asyncio
 # Ensure project root is on path when running as script
 import os, sys
 sys.path.append(os.path.dirname(__file__))
-import uvicorn
 
 def main():
-    """Launch FastAPI web server (controllers.controller:app) on port 8080."""
-    uvicorn.run("controllers.controller:app", host="0.0.0.0", port=8081, reload=True)
+    """Launch FastAPI web server (controllers.controller:app) on port 8081.
+    
+    Set DEV=1 to run with auto-reload for local development.
+    """
+    import uvicorn
+    if os.getenv("DEV"):
+        uvicorn.run("controllers.controller:app", host="0.0.0.0", port=8081, reload=True)
+        return
+    
+    # Agents are cached in process memory, so each worker holds its own
+    # sessions; only raise WEB_CONCURRENCY behind a sticky load balancer
+    uvicorn.run(
+        "controllers.controller:app",
+        host="0.0.0.0",
+        port=8081,
+        reload=False,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
 
 if __name__ == "__main__":
     main()
@@ -2,12 +2,14 @@
 Pydantic models for accommodation-related data structures.
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
 class RoomType(BaseModel):
     """Model for room type information."""
+    model_config = ConfigDict(extra="ignore", frozen=True, validate_assignment=False)
+    
     propertyRoomTypeId: int = Field(description="Property room type identifier")
     roomTypeCode: str = Field(description="Room type code")
     description: str = Field(description="Room type description")
@@ -16,10 +18,16 @@ class RoomType(BaseModel):
 
 class Accommodation(BaseModel):
     """Model for accommodation information."""
+    model_config = ConfigDict(extra="ignore", frozen=True, validate_assignment=False)
+    
     firstNight: str = Field(description="First night of stay in YYYY-MM-DD format")
     lastNight: str = Field(description="Last night of stay in YYYY-MM-DD format")
     propertyCode: str = Field(description="Property code identifier")
-    AccommodationName: str = Field(description="Property name/ Accommodation Name")
+    # MuleSoft sends the property name as "name"
+    AccommodationName: str = Field(
+        validation_alias=AliasChoices("AccommodationName", "name"),
+        description="Property name/ Accommodation Name"
+    )
     roomTypes: List[RoomType] = Field(description="List of available room types")
 
 
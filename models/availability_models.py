@@ -2,24 +2,30 @@
 Pydantic models for availability-related data structures.
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+# Pydantic needs the typing_extensions TypedDict on Python < 3.12
+from typing_extensions import TypedDict
 
 
-class Tour(BaseModel):
-    """Model for tour information."""
-    tourId: int = Field(description="Tour identifier")
-    numberAvailable: int = Field(description="Number of available slots")
-    time: str = Field(description="Tour time")
+# Tours and tour dates are small records nested many times per response, so
+# they are plain dicts rather than models
+class Tour(TypedDict):
+    """Tour information: identifier, number of available slots and tour time."""
+    tourId: int
+    numberAvailable: int
+    time: str
 
 
-class TourDate(BaseModel):
-    """Model for tour date information."""
-    tourDate: str = Field(description="Date in YYYY-MM-DD format")
-    tours: List[Tour] = Field(description="List of available tours on this date")
+class TourDate(TypedDict):
+    """Tour date information: date in YYYY-MM-DD format and the tours available on it."""
+    tourDate: str
+    tours: List[Tour]
 
 
 class AvailableDateRange(BaseModel):
     """Model for available date range with tour information."""
+    model_config = ConfigDict(extra="ignore", frozen=True, validate_assignment=False)
+    
     firstNight: str = Field(description="First night of stay in YYYY-MM-DD format")
     lastNight: str = Field(description="Last night of stay in YYYY-MM-DD format")
     tourDates: List[TourDate] = Field(description="List of available tour dates within this range")
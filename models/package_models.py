@@ -1,12 +1,19 @@
 """
 Pydantic models for package-related data structures.
 """
+import re
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+# First run of digits in a package name, e.g. the 3 in "3 Night Resort"
+_LOS_RE = re.compile(r'\d+')
 
 
 class PackageResponseModel(BaseModel):
     """Model for vacation package details."""
+    # defer_build: the validator is built on first use rather than at import
+    model_config = ConfigDict(extra="ignore", frozen=True, validate_assignment=False, defer_build=True)
+    
     # Required fields
     initiative: str = Field(description="Campaign identifier")
     packageId: str = Field(description="Unique identifier for the package")
@@ -27,13 +34,19 @@ class PackageResponseModel(BaseModel):
         Returns:
             int: The length of stay in nights, or 0 if not found
         """
-        import re
-        if not self.packageName:
+        name = self.packageName
+        if not name:
             return 0
             
-        # Extract the first number from the package name
-        match = re.search(r'\d+', self.packageName)
+        # Most names start with the night count, so read it without the regex
+        if name[0].isdecimal():
+            end = 1
+            while end < len(name) and name[end].isdecimal():
+                end += 1
+            return int(name[:end])
+            
+        # Otherwise extract the first number from the package name
+        match = _LOS_RE.search(name)
         if match:
             return int(match.group())
         return 0
-    
\ No newline at end of file
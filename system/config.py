@@ -8,3 +8,7 @@ AZURE_ENDPOINT = os.getenv("AZURE_ENDPOINT", "https://vacationpackageagent.cogni
 AZURE_API_KEY = os.getenv("AZURE_API_KEY", "A4Nq1Faqsy2DXheIpsqH1Hel4fTNh1runWKEd2t8IPKWcYWxhPMpJQQJ99BGACYeBjFXJ3w3AAAAACOGACoe")
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "2024-12-01-preview")
 PACKAGE_ID = os.getenv("PACKAGE_ID", "qlw44ZwBEtPCNEVqD4cJDFoK4to7/IO4nZtjE0sVjHk")
+
+# MuleSoft response cache: seconds a response is reused and maximum number of cached queries
+MULESOFT_CACHE_TTL = int(os.getenv("MULESOFT_CACHE_TTL", "900"))
+MULESOFT_CACHE_MAXSIZE = int(os.getenv("MULESOFT_CACHE_MAXSIZE", "512"))
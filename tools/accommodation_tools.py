@@ -1,31 +1,26 @@
 """
 Tools for handling accommodation-related functionality.
 """
-import json
 import os
 import logging
 from typing import List, Optional
-from datetime import datetime, timedelta
-from datasource.mulesoft_service import MuleSoftService
+from datetime import date, timedelta
+from datasource.mulesoft_service import mulesoft_service
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
-from models.accommodation_models import (
-    AccommodationResponse,
-    Accommodation
-)
+from models.accommodation_models import AccommodationResponse
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 class AccommodationDetails:
-    def __init__(self):
-        self._accommodations = None
-
+    """Tool for looking up accommodations; holds no per-call state, so one instance is shared safely."""
+    
     @kernel_function(
         description="Get accommodation details for a specific check-in date and length of stay",
         name="get_accommodation_details"
     )
-    def get_accommodation_details(self, checkin_date: str, length_of_stay: int, destination: str, number_of_guests: int, campaign_initiative_id: str,accommodation_type: str) -> AccommodationResponse:
+    async def get_accommodation_details(self, checkin_date: str, length_of_stay: int, destination: str, number_of_guests: int, campaign_initiative_id: str,accommodation_type: str) -> AccommodationResponse:
         """
         Get accommodation details for a specified check-in date and length of stay.
         Loads data from MuleSoft API and filters based on criteria.
@@ -41,51 +36,45 @@ class AccommodationDetails:
         Returns:
             An AccommodationResponse object containing available accommodation options
         """
-        logger.info(f"get_accommodation_details called with: checkin_date={checkin_date}, length={length_of_stay}, destination={destination}, guests={number_of_guests}")
+        logger.info("get_accommodation_details called with: checkin_date=%s, length=%s, destination=%s, guests=%s", checkin_date, length_of_stay, destination, number_of_guests)
         
         try:
-            mulesoft_service = MuleSoftService()
-            
-            api_response = mulesoft_service.get_accommodations_mulesoft_api(                
+            accommodations = await mulesoft_service.aget_accommodations(
                 length_of_stay=length_of_stay,          
                 campaign_initiative_id=campaign_initiative_id,  
                 accommodation_type=accommodation_type.lower(),
                 number_of_guests=number_of_guests,
                 destination=destination.upper(),
-                checkin_date=checkin_date
+                checkin_date=checkin_date,
+                first_night=checkin_date
             )
 
-            self._accommodations = api_response
-            
-            logger.info(f"Successfully loaded accommodation data for {destination}")
+            logger.info("Successfully loaded accommodation data for %s", destination)
 
-            # Filter accommodations based on check-in date and length of stay
+            # Filter accommodations based on length of stay. The service only
+            # returns (and caches) the rows whose firstNight is the check-in
+            # date, so the response is already the candidate set for that date.
             filtered_accommodations = []
             
-            if self._accommodations:
-                for accommodation in self._accommodations:
-                    # Check if the accommodation's first night matches the requested check-in date
-                    if accommodation.get("firstNight") == checkin_date:
-                        # Calculate the expected last night based on length of stay
-                        checkin_dt = datetime.strptime(checkin_date, "%Y-%m-%d")
-                        expected_last_night = (checkin_dt + timedelta(days=length_of_stay - 1)).strftime("%Y-%m-%d")
-                        
-                        # Check if the accommodation's last night is greater than or equal to the expected last night
-                        if accommodation.get("lastNight", "") >= expected_last_night:
-                            filtered_accommodations.append(accommodation)
-            
-            # Map 'name' field to 'AccommodationName' to match the model requirements
-            for acc in filtered_accommodations:
-                if 'name' in acc and 'AccommodationName' not in acc:
-                    acc['AccommodationName'] = acc['name']
+            if accommodations:
+                # Calculate the expected last night based on length of stay
+                checkin_dt = date.fromisoformat(checkin_date)
+                expected_last_night = (checkin_dt + timedelta(days=length_of_stay - 1)).isoformat()
+                
+                # Keep accommodations that last at least the whole stay; the model
+                # reads the MuleSoft 'name' field as AccommodationName itself
+                filtered_accommodations = [
+                    accommodation for accommodation in accommodations
+                    if accommodation.get("lastNight", "") >= expected_last_night
+                ]
                     
-            response = AccommodationResponse(accommodations=[Accommodation.parse_obj(acc) for acc in filtered_accommodations])
+            # Validate the whole list in a single pass rather than one model at a time
+            response = AccommodationResponse.model_validate({"accommodations": filtered_accommodations})
             
-            logger.info(f"Returning accommodation response with {len(response.accommodations)} options")
+            logger.info("Returning accommodation response with %d options", len(response.accommodations))
             return response
 
         except Exception as e:
             error_msg = f"Failed to load accommodation data: {str(e)}"
             logger.error(error_msg, exc_info=True)
-            self._accommodations = None
             return AccommodationResponse(accommodations=[])
\ No newline at end of file
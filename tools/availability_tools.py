@@ -1,12 +1,14 @@
 """
 Tools for handling availability-related functionality.
 """
-import json
 import os
+import bisect
+import functools
 import logging
+from contextvars import ContextVar
 from typing import List, Optional
-from datetime import datetime, timedelta
-from datasource.mulesoft_service import MuleSoftService
+from datetime import date, timedelta
+from datasource.mulesoft_service import mulesoft_service
 from system.config import PACKAGE_ID
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
@@ -23,15 +25,100 @@ from models.availability_models import (
 logger = logging.getLogger(__name__)
 
 
-class AvailabilityDetails:
+def _build(model, **fields):
+    """Build a summary model, skipping validation when the MuleSoft service is trusted."""
+    if mulesoft_service.trusted:
+        return model.model_construct(**fields)
+    return model(**fields)
+
+
+_ONE_DAY = timedelta(days=1)
+_FROMISOFORMAT = date.fromisoformat
+
+
+@functools.lru_cache(maxsize=4096)
+def _shift_one_day(iso_date: str) -> str:
+    """Return the YYYY-MM-DD date one day after iso_date; the same dates recur across requests."""
+    return (_FROMISOFORMAT(iso_date) + _ONE_DAY).isoformat()
+
+
+class AvailabilityState:
+    """One session's latest availability data, kept apart from the plugin shared by all sessions."""
+    __slots__ = ("availabilities", "availabilities_model", "date_ranges", "first_nights", "last_nights")
+    
     def __init__(self):
-        self._availabilities = {}
+        self.clear()
+    
+    def clear(self) -> None:
+        """Forget the loaded availability data."""
+        # Raw availability data and the summary model built from it once, when it arrives
+        self.availabilities = None
+        self.availabilities_model: Optional[AvailabilityResponse] = None
+        # Summary date ranges sorted by firstNight, with their raw firstNight/lastNight keys
+        self.date_ranges: List[AvailableDateRange] = []
+        self.first_nights: List[str] = []
+        self.last_nights: List[str] = []
+    
+    def store(self, availability_data, model: AvailabilityResponse) -> None:
+        """
+        Store new availability data and the summary model built from it.
+        
+        The summary's date ranges are indexed by firstNight for the search
+        filter. ISO dates sort lexicographically, and the API already returns
+        ranges in order, which makes the sort a single linear pass.
+        """
+        # Pair each summary range with its raw lastNight: the filter compares
+        # against that, not the summary's value shifted by one day
+        raw_ranges = availability_data.get("availableDates", [])
+        indexed = sorted(zip(model.availableDates, raw_ranges), key=lambda pair: pair[0].firstNight)
+        
+        self.date_ranges = [date_range for date_range, _ in indexed]
+        self.first_nights = [date_range.firstNight for date_range in self.date_ranges]
+        self.last_nights = [raw_range["lastNight"] for _, raw_range in indexed]
+        self.availabilities_model = model
+        self.availabilities = availability_data
+    
+    def ranges_between(self, search_start_date: str, search_end_date: str) -> List[AvailableDateRange]:
+        """Return the stored date ranges that fall within the search range."""
+        # Binary search bounds firstNight, so only those candidates check lastNight
+        lo = bisect.bisect_left(self.first_nights, search_start_date)
+        hi = bisect.bisect_right(self.first_nights, search_end_date)
+        return [
+            date_range for date_range, last_night in zip(self.date_ranges[lo:hi], self.last_nights[lo:hi])
+            if last_night <= search_end_date
+        ]
+
+
+# State of the session whose turn is running; each VacationChatAgent binds its
+# own AvailabilityState around agent invocations
+session_availability: ContextVar[Optional[AvailabilityState]] = ContextVar("session_availability", default=None)
+
+
+def _session_state() -> AvailabilityState:
+    """Return the calling session's availability state, or a throwaway one outside a session.
+    
+    Nothing is ever stored on the shared plugin, so an unbound call can't
+    see or overwrite another session's data; it just isn't remembered.
+    """
+    state = session_availability.get()
+    if state is None:
+        logger.warning("Availability tool called outside a session; the result won't be remembered")
+        return AvailabilityState()
+    return state
+
+
+class AvailabilityDetails:
+    """Tool for availability searches; holds no per-call state, so one instance is shared safely.
+    
+    Each session's latest search lives in the AvailabilityState bound to
+    session_availability for the running turn.
+    """
 
     @kernel_function(
         description="Get availability information for a date range. Package details should be obtained from a previous PackageDetails-get_package_summary call.",
         name="get_availability"
     )
-    def get_availability(
+    async def get_availability(
         self, 
         number_of_guests: int, 
         search_start_date: str, 
@@ -58,18 +145,17 @@ class AvailabilityDetails:
         Returns:
             AvailabilityResponse object with availability data
         """
-        logger.info(f"load_availabilities called with guests: {number_of_guests}, start: {search_start_date}, end: {search_end_date}, destination: {destination}")
+        logger.info("load_availabilities called with guests: %s, start: %s, end: %s, destination: %s", number_of_guests, search_start_date, search_end_date, destination)
         
+        state = _session_state()
         try:
             package_id = PACKAGE_ID 
         
-            logger.info(f"Using package data - ID: {package_id}, Destination: {destination}, "
-                    f"Length: {length_of_stay}, Campaign: {campaign_initiative_id}, Type: {accommodation_type}")
+            logger.info("Using package data - ID: %s, Destination: %s, Length: %s, Campaign: %s, Type: %s",
+                        package_id, destination, length_of_stay, campaign_initiative_id, accommodation_type)
             
             # Load availability data from MuleSoft API
-
-            mulesoft_service = MuleSoftService()
-            api_response = mulesoft_service.get_availabilities_mulesoft_api(
+            api_response = await mulesoft_service.aget_availabilities(
                 destination=destination.upper(),
                 package_id=package_id,
                 length_of_stay=length_of_stay,
@@ -80,26 +166,33 @@ class AvailabilityDetails:
                 search_end_date=search_end_date
             )
 
-            self._availabilities = api_response
+            # Cached responses come back as the same object, already converted
+            # if this session loaded it last; the summary is built once per session
+            if api_response is not state.availabilities:
+                state.store(api_response, self._format_availability_summary(
+                    api_response.get("destination", ""),
+                    api_response.get("campaign", ""),
+                    api_response.get("availableDates", [])
+                ))
 
-            # Filter available dates that overlap with the search range
-            filtered_data = self._availabilities.copy()
-            filtered_data["availableDates"] = [
-                date_range for date_range in self._availabilities.get("availableDates", [])
-                if (date_range["firstNight"] >= search_start_date and 
-                    date_range["lastNight"] <= search_end_date)
-            ]
+            # Filter available dates that fall within the search range
+            filtered_dates = state.ranges_between(search_start_date, search_end_date)
         
-            # Convert filtered JSON data to Pydantic models using our helper method
-            response = self._format_availability_summary(filtered_data)
+            # Reuse the already-built range models rather than converting again
+            response = _build(
+                AvailabilityResponse,
+                destination=state.availabilities_model.destination,
+                campaign=state.availabilities_model.campaign,
+                availableDates=filtered_dates
+            )
             
-            logger.info(f"Returning availability response with {len(response.availableDates)} date ranges")
+            logger.info("Returning availability response with %d date ranges", len(response.availableDates))
             return response
     
         except Exception as e:
             error_msg = f"Failed to load availability data: {str(e)}"
             logger.error(error_msg, exc_info=True)
-            self._availabilities = None
+            state.clear()
             return None
         
     @kernel_function(
@@ -115,59 +208,59 @@ class AvailabilityDetails:
         """
         logger.info("get_availability_summary function called")
         
-        if not self._availabilities:
+        state = _session_state()
+        if not state.availabilities:
             logger.warning("No availabilities data loaded")
             return None
         
-        # Convert the JSON data to Pydantic models
-        response = self._format_availability_summary(self._availabilities)
+        # The summary was built when the data arrived, so this is a plain read
+        response = state.availabilities_model
         
-        logger.info(f"Returning availability summary with {len(response.availableDates)} date ranges")
+        logger.info("Returning availability summary with %d date ranges", len(response.availableDates))
         return response
         
-    def _format_availability_summary(self, availability_data) -> AvailabilityResponse:
+    def _format_availability_summary(self, destination: str, campaign: str, available_dates_raw: list) -> AvailabilityResponse:
         """
         Format the availability data into a proper Pydantic model structure.
         
         Args:
-            availability_data: Raw availability data from JSON
+            destination: Destination from the availability data
+            campaign: Campaign from the availability data
+            available_dates_raw: Raw date ranges from JSON to include in the response
             
         Returns:
             An AvailabilityResponse object with properly structured nested models
         """
-        # Convert available dates
-        available_dates = []
-        for date_range in availability_data.get("availableDates", []):
-            # Convert tour dates
-            tour_dates = []
-            for tour_date_entry in date_range.get("tourDates", []):
-                # Convert tours
-                tours = []
-                for tour_entry in tour_date_entry.get("tours", []):
-                    tour = Tour(
-                        tourId=tour_entry.get("tourId"),
-                        numberAvailable=tour_entry.get("numberAvailable"),
-                        time=tour_entry.get("time")
+        # Convert available dates in one nested comprehension; tour dates and
+        # tours are plain dicts (TypedDicts), built directly
+        available_dates = [
+            _build(
+                AvailableDateRange,
+                firstNight=date_range["firstNight"],
+                lastNight=_shift_one_day(date_range["lastNight"]),
+                tourDates=[
+                    TourDate(
+                        tourDate=tour_date_entry.get("tourDate"),
+                        tours=[
+                            Tour(
+                                tourId=tour_entry.get("tourId"),
+                                numberAvailable=tour_entry.get("numberAvailable"),
+                                time=tour_entry.get("time")
+                            )
+                            for tour_entry in tour_date_entry.get("tours", ())
+                        ]
                     )
-                    tours.append(tour)
-                
-                tour_date = TourDate(
-                    tourDate=tour_date_entry.get("tourDate"),
-                    tours=tours
-                )
-                tour_dates.append(tour_date)
-
-            available_date_range = AvailableDateRange(
-                firstNight=date_range.get("firstNight"),
-                lastNight=(datetime.strptime(date_range.get("lastNight"), "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"),
-                tourDates=tour_dates
+                    for tour_date_entry in date_range.get("tourDates", ())
+                ]
             )
-            available_dates.append(available_date_range)
+            for date_range in available_dates_raw
+        ]
         
         # Create the response
-        response = AvailabilityResponse(
-            destination=availability_data.get("destination", ""),
-            campaign=availability_data.get("campaign", ""),
+        response = _build(
+            AvailabilityResponse,
+            destination=destination,
+            campaign=campaign,
             availableDates=available_dates
         )
         
@@ -1,16 +1,16 @@
 """
 Tools for handling vacation package details.
 """
-import json
 import os
+import asyncio
 import logging
-from typing import List, Optional
+from typing import ClassVar, Dict, FrozenSet, List, Optional, Tuple
 import logging
  
 import semantic_kernel as sk
 from semantic_kernel.functions import kernel_function, KernelFunction
 from semantic_kernel.functions.kernel_arguments import KernelArguments
-from datasource.mulesoft_service import MuleSoftService
+from datasource.mulesoft_service import mulesoft_service
  
 from system.config import PACKAGE_ID
 from models.package_models import PackageResponseModel
@@ -21,31 +21,68 @@ logger = logging.getLogger(__name__)
 class PackageDetails:
     """Tool for retrieving and displaying vacation package details."""
    
+    # The package is the same for every instance (one per event loop's shared
+    # kernel), so it is fetched and validated once per process
+    _package_cls_cache: ClassVar[Optional[PackageResponseModel]] = None
+   
     def __init__(self):
         """Initialize the PackageDetails tool."""
         logger.info("Initializing PackageDetails tool")
         self._package = None
-        self._load_package_data()
+        # Upper-cased destination name -> (name, is primary, non-qualified zip codes)
+        self._nq_index: Dict[str, Tuple[str, bool, FrozenSet[str]]] = {}
+        # Concurrent first calls on this instance's event loop share one fetch
+        self._load_lock = asyncio.Lock()
+   
+    async def _ensure_loaded(self):
+        """Load the package on first use; a failed load is retried next call."""
+        if self._package is None:
+            async with self._load_lock:
+                if self._package is None:
+                    await self._load_package_data()
    
-    def _load_package_data(self):
-        """Load package data from MuleSoft API."""
+    async def _load_package_data(self):
+        """Load package data from MuleSoft API, reusing the model loaded by an earlier instance."""
         try:
-
-           
-            mulesoft_service = MuleSoftService()
-            api_response = mulesoft_service.get_packages_mulesoft_api(PACKAGE_ID)
-            self._package = PackageResponseModel(**api_response)
+            package = PackageDetails._package_cls_cache
+            if package is None:
+                api_response = await mulesoft_service.aget_packages(PACKAGE_ID)
+                if mulesoft_service.trusted:
+                    # All nested fields are plain dicts, so nothing needs building first
+                    package = PackageResponseModel.model_construct(**api_response)
+                else:
+                    package = PackageResponseModel.model_validate(api_response)
+                PackageDetails._package_cls_cache = package
+                logger.info("Successfully loaded package from MuleSoft API: %s", package.packageName)
  
-            logger.info(f"Successfully loaded package from MuleSoft API: {self._package.packageName}")
+            # Index before publishing the package, since callers check _package
+            self._nq_index = self._build_nq_index(package)
+            self._package = package
  
         except Exception as e:
-            logger.error(f"Error loading package data: {e}", exc_info=True)
+            logger.error("Error loading package data: %s", e, exc_info=True)
+   
+    @staticmethod
+    def _build_nq_index(package: PackageResponseModel) -> Dict[str, Tuple[str, bool, FrozenSet[str]]]:
+        """
+        Index the package destinations by upper-cased name for zip code verification.
+        
+        Primary destinations are indexed first and the first entry for a name
+        wins, matching the order in which they were previously scanned.
+        """
+        index = {}
+        for is_primary, destinations in ((True, package.destination), (False, package.alternateDestinations)):
+            for dest in destinations:
+                dest_name = dest.get("destination", "")
+                if dest_name:
+                    index.setdefault(dest_name.upper(), (dest_name, is_primary, frozenset(dest.get("nqZipCodes", []))))
+        return index
    
     @kernel_function(
         description="Get package details",
         name="get_package_summary"
     )
-    def get_package_summary(self) -> PackageResponseModel:
+    async def get_package_summary(self) -> PackageResponseModel:
         """
         Get the package model object.
        
@@ -53,23 +90,24 @@ class PackageDetails:
             A PackageResponseModel object containing package details
         """
         logger.info("get_package_summary function called")
+        await self._ensure_loaded()
         if not self._package:
             logger.warning("No package available")
             return None
        
-        logger.info(f"Returning package model: {self._package.packageName}")
+        logger.info("Returning package model: %s", self._package.packageName)
         return self._format_package_summary(self._package)
            
     def _format_package_summary(self, package: PackageResponseModel) -> PackageResponseModel:
         """Return the package model directly."""
-        logger.debug(f"Returning package model for ID: {package.packageId}")
+        logger.debug("Returning package model for ID: %s", package.packageId)
         return package
        
     @kernel_function(
         description="Verify if a zip code is valid for a confirmed destination",
         name="ZipCodeVerification"
     )
-    def ZipCodeVerification(self, confirmed_user_destination: str, user_input_zipcode: str) -> str:
+    async def ZipCodeVerification(self, confirmed_user_destination: str, user_input_zipcode: str) -> str:
         """
         Verify if a user-provided zip code is valid for a confirmed destination.
        
@@ -80,8 +118,9 @@ class PackageDetails:
         Returns:
             A string indicating whether the zip code is valid for the destination
         """
-        logger.info(f"Verifying zip code {user_input_zipcode} for destination {confirmed_user_destination}")
+        logger.info("Verifying zip code %s for destination %s", user_input_zipcode, confirmed_user_destination)
        
+        await self._ensure_loaded()
         if not self._package:
             logger.warning("No package available to verify zip code")
             return "Unable to verify zip code: No package data available."
@@ -90,43 +129,22 @@ class PackageDetails:
         confirmed_user_destination = confirmed_user_destination.strip().upper()
         user_input_zipcode = user_input_zipcode.strip()
        
-        # Check primary destinations first
-        for dest in self._package.destination:
-            dest_name = dest.get("destination", "")
+        # One lookup in the destination index instead of scanning both lists
+        entry = self._nq_index.get(confirmed_user_destination)
+        if entry is not None:
+            dest_name, is_primary, nq_zip_codes = entry
+            kind = "primary" if is_primary else "alternative"
+            logger.info("Found matching %s destination: %s", kind, dest_name)
            
-            # Check if this is the confirmed destination
-            if dest_name and dest_name.upper() == confirmed_user_destination:
-                logger.info(f"Found matching primary destination: {dest_name}")
-               
-                # Check if the zip code is in the non-qualified zip codes list
-                nq_zip_codes = dest.get("nqZipCodes", [])
-               
-                if user_input_zipcode in nq_zip_codes:
-                    logger.info(f"Zip code {user_input_zipcode} is NOT valid for primary destination {dest_name}")
-                    return f"The zip code {user_input_zipcode} is not valid for {dest_name}. Please select a different destination."
-                else:
-                    logger.info(f"Zip code {user_input_zipcode} is valid for primary destination {dest_name}")
-                    return f"The zip code {user_input_zipcode} is valid for {dest_name}. Let's continue with your vacation booking."
-       
-        # If not found in primary destinations, check alternative destinations
-        for alt_dest in self._package.alternateDestinations:
-            alt_dest_name = alt_dest.get("destination", "")
-           
-            # Check if this is the confirmed destination
-            if alt_dest_name and alt_dest_name.upper() == confirmed_user_destination:
-                logger.info(f"Found matching alternative destination: {alt_dest_name}")
-               
-                # Check if the zip code is in the non-qualified zip codes list
-                nq_zip_codes = alt_dest.get("nqZipCodes", [])
-               
-                if user_input_zipcode in nq_zip_codes:
-                    logger.info(f"Zip code {user_input_zipcode} is NOT valid for alternative destination {alt_dest_name}")
-                    return f"The zip code {user_input_zipcode} is not valid for {alt_dest_name}. Please select a different destination."
-                else:
-                    logger.info(f"Zip code {user_input_zipcode} is valid for alternative destination {alt_dest_name}")
-                    return f"The zip code {user_input_zipcode} is valid for {alt_dest_name}. Let's continue with your vacation booking."
+            # Check if the zip code is in the non-qualified zip codes set
+            if user_input_zipcode in nq_zip_codes:
+                logger.info("Zip code %s is NOT valid for %s destination %s", user_input_zipcode, kind, dest_name)
+                return f"The zip code {user_input_zipcode} is not valid for {dest_name}. Please select a different destination."
+            else:
+                logger.info("Zip code %s is valid for %s destination %s", user_input_zipcode, kind, dest_name)
+                return f"The zip code {user_input_zipcode} is valid for {dest_name}. Let's continue with your vacation booking."
        
-        logger.warning(f"No matching destination found for {confirmed_user_destination} in primary or alternative destinations")
+        logger.warning("No matching destination found for %s in primary or alternative destinations", confirmed_user_destination)
         return f"Unable to verify zip code: Destination '{confirmed_user_destination}' not found in available package destinations."
  
  
\ No newline at end of file